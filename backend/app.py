@@ -1,22 +1,39 @@
+import base64
+import functools
+import hashlib
 import io
-import json
+import itertools
 import logging
 import os
 import re
 import sys
-from difflib import SequenceMatcher
+from bisect import bisect_left
+from collections import defaultdict
 
+import numpy as np
+import orjson
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
 from dotenv import load_dotenv
 from flask import Flask, jsonify, request
+from flask.helpers import get_debug_flag
+from flask.json.provider import DefaultJSONProvider, JSONProvider
 from flask_cors import CORS
-from openai import OpenAI
+from openai import NotFoundError
+from PIL import Image, ImageOps
+from rapidfuzz import fuzz, process
+
+from openai_runner import cached_chat_response, client, response_cache_key, run_chat, wants_stream
+from prompts import SYSTEM_MESSAGES, USER_PROMPTS, prompt_language
+from tokens import count_tokens, get_enc
 
 load_dotenv()
 
-# Configure logging
+# Configure logging, WARNING by default so request-level INFO/DEBUG calls are skipped in production
 logging.basicConfig(
-    level=logging.INFO,
+    level=os.getenv("LOG_LEVEL", "WARNING").upper(),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
         logging.StreamHandler(sys.stdout)
@@ -24,124 +41,119 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-CORS(app)
-
-# Initialize OpenAI client
-api_key = os.getenv("OPENAI_API_KEY")
-if api_key:
-    logger.info("OpenAI API key loaded successfully")
-    client = OpenAI(api_key=api_key)
-else:
-    logger.error("OpenAI API key not found in environment variables")
-    client = None
 
-# Token pricing for gpt-4o-mini (as of 2024)
-# https://openai.com/api/pricing/
-INPUT_TOKEN_PRICE = 0.150 / 1_000_000  # $0.150 per 1M input tokens
-OUTPUT_TOKEN_PRICE = 0.600 / 1_000_000  # $0.600 per 1M output tokens
+class OrjsonProvider(JSONProvider):
+    """JSON provider that serializes with orjson instead of the stdlib json module"""
 
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
 
-@app.route("/api/analyze", methods=["POST"])
-def analyze_image():
-    """
-    Module 3: Analyze an image using OpenAI Vision API
-    """
-    logger.info("Image analysis request received")
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=DefaultJSONProvider.default, option=self.option).decode()
 
-    try:
-        data = request.get_json()
-        if not data or "image" not in data:
-            logger.warning("No image provided in request")
-            return jsonify({"error": "No image provided"}), 400
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
-        image_base64 = data["image"]
-        language = data.get("language", "en")
-        logger.info(f"Processing image analysis request (language: {language})")
+    def response(self, *args, **kwargs):
+        # Skip the bytes -> str -> bytes round trip that dumps() would need
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=DefaultJSONProvider.default, option=self.option)
+        return self._app.response_class(body, mimetype="application/json")
 
-        # Prepare prompt based on language
-        if language == "ko":
-            prompt = """당신은 AstraSemi Corporation의 반도체 제조 및 운영을 위한 전문 AI 어시스턴트입니다.
 
-다음 이미지를 선임 엔지니어 수준의 세부 사항과 전문성으로 분석하세요.
-이미지가 반도체 제조, 장비, 웨이퍼, 칩 또는 공정 이상과 관련이 있는 경우 다음을 제공하세요:
+app = Flask(__name__)
+app.json = OrjsonProvider(app)
+CORS(app)
 
-### 요약
-- 이미지에 표시된 내용에 대한 간결하고 명확한 요약 (2-3문장)
 
-### 주요 관찰사항
-- 이미지에서 주목할 만한 최대 5개의 중요한 관찰사항, 패턴 또는 이상 현상을 나열하세요
+# Vision payload limits: images are downscaled to fit IMAGE_MAX_SIZE and re-encoded as JPEG,
+# and anything that fits LOW_DETAIL_MAX_SIZE is sent at "low" detail (a single 512px tile)
+IMAGE_MAX_SIZE = 1024
+IMAGE_JPEG_QUALITY = 85
+LOW_DETAIL_MAX_SIZE = 512
 
-### 실행 가능한 권장사항
-1. 관찰한 내용을 기반으로 구체적이고 실행 가능한 다음 단계 또는 확인 사항을 최대 3개 제안하세요
 
-이미지가 반도체와 관련이 없는 경우 일반적인 설명을 제공하고 제조와 관련이 없다고 명시하세요.
-깔끔하고 잘 구조화된 마크다운 형식으로 응답하세요."""
-        else:
-            prompt = """You are an expert AI assistant for semiconductor manufacturing and operations at AstraSemi Corporation.
+def prepare_image(image_bytes):
+    """Downscale and JPEG re-encode an uploaded image, returns (data_url, detail)"""
+    image = Image.open(io.BytesIO(image_bytes))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((IMAGE_MAX_SIZE, IMAGE_MAX_SIZE), Image.LANCZOS)
 
-Analyze the following image with the same level of detail and professionalism as a senior engineer.
-If the image is related to semiconductor manufacturing, equipment, wafers, chips, or process anomalies, provide:
+    # JPEG has no alpha channel, flatten transparent images onto white
+    if image.mode != "RGB":
+        rgba = image.convert("RGBA")
+        image = Image.new("RGB", rgba.size, (255, 255, 255))
+        image.paste(rgba, mask=rgba.getchannel("A"))
 
-### Summary
-- A concise, clear summary of what is shown in the image (2-3 sentences)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=IMAGE_JPEG_QUALITY)
+    data_url = "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
 
-### Key Observations
-- List up to 5 important observations, patterns, or anomalies you notice in the image
+    detail = "low" if max(image.size) <= LOW_DETAIL_MAX_SIZE else "auto"
+    return data_url, detail
 
-### Actionable Recommendations
-1. Suggest up to 3 specific, actionable next steps or checks based on what you see
 
-If the image is not related to semiconductors, provide a general description and note that it is not relevant to manufacturing.
-Respond in clean, well-structured markdown format."""
+@app.route("/api/analyze", methods=["POST"])
+def analyze_image():
+    """
+    Module 3: Analyze an image using OpenAI Vision API
+    """
+    logger.info("Image analysis request received")
 
-        # Call OpenAI Vision API
-        if not client:
-            logger.error("OpenAI client not initialized")
-            return jsonify({"error": "OpenAI API not configured"}), 500
+    try:
+        # Raw multipart upload, or a base64 data URL in a JSON body (older clients)
+        if "image" in request.files:
+            image_data = request.files["image"].read()
+            language = request.form.get("language", "en")
+        else:
+            data = request.get_json(silent=True)
+            if not data or "image" not in data:
+                logger.warning("No image provided in request")
+                return jsonify({"error": "No image provided"}), 400
+            image_data = data["image"]
+            language = data.get("language", "en")
+
+        logger.info("Processing image analysis request (language: %s)", language)
+
+        # Shrink the image before sending it, image tokens scale with resolution
+        try:
+            if isinstance(image_data, str):
+                _, _, encoded = image_data.partition(",")
+                image_data = base64.b64decode(encoded or image_data)
+            image_url, image_detail = prepare_image(image_data)
+        # Truncated/corrupt files raise OSError (UnidentifiedImageError is one) while decoding
+        except (ValueError, OSError, Image.DecompressionBombError) as e:
+            logger.warning("Invalid image provided: %s", e)
+            return jsonify({"error": "Invalid image"}), 400
+        logger.debug("Prepared image for vision API (%d bytes, detail: %s)", len(image_url), image_detail)
 
-        logger.info("Calling OpenAI Vision API")
-        response = client.chat.completions.create(
+        # Prepare prompt based on language
+        lang = prompt_language(language)
+        prompt = USER_PROMPTS["analyze-image", lang]
+
+        messages = [
+            SYSTEM_MESSAGES["analyze-image", lang],
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt},
+                    {"type": "image_url", "image_url": {"url": image_url, "detail": image_detail}},
+                ],
+            },
+        ]
+
+        return run_chat(
+            "analyze_image",
             model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert AI assistant specializing in semiconductor manufacturing and equipment analysis.",
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {"type": "image_url", "image_url": {"url": image_base64}},
-                    ],
-                },
-            ],
+            messages=messages,
             max_tokens=1000,
             temperature=0.7,
+            result_key="analysis",
+            error="An error occurred while analyzing the image",
+            stream=wants_stream(),
         )
 
-        # Extract token usage and calculate cost
-        usage = response.usage
-        input_tokens = usage.prompt_tokens
-        output_tokens = usage.completion_tokens
-        total_tokens = usage.total_tokens
-
-        input_cost = input_tokens * INPUT_TOKEN_PRICE
-        output_cost = output_tokens * OUTPUT_TOKEN_PRICE
-        total_cost = input_cost + output_cost
-
-        logger.info(
-            f"Token usage - Input: {input_tokens:,}, Output: {output_tokens:,}, "
-            f"Total: {total_tokens:,}, Cost: ${total_cost:.6f}"
-        )
-
-        analysis = response.choices[0].message.content.strip()
-        logger.info(f"Image analysis completed successfully ({len(analysis)} characters)")
-
-        return jsonify({"success": True, "analysis": analysis})
-
     except Exception as e:
-        logger.error(f"Error in image analysis: {str(e)}", exc_info=True)
+        logger.error("Error in image analysis: %s", e, exc_info=True)
         return jsonify({"error": "An error occurred while analyzing the image"}), 500
 
 
@@ -165,6 +177,220 @@ def get_data():
     )
 
 
+# Most files accepted by one batch or async request, each adds up to 1500 output tokens
+CSV_BATCH_MAX_FILES = 10
+
+# Bytes parsed per block when streaming an uploaded CSV with Arrow (column types are
+# inferred from the first block), and rows per chunk in the pandas fallback
+CSV_BLOCK_SIZE = 8 << 20
+CSV_CHUNK_ROWS = 50_000
+
+# Rows sent to the model (and shown in the data preview) alongside the schema and column stats
+CSV_SAMPLE_ROWS = 10
+
+# Prompt budget for CSV analysis, leaves room for the completion in gpt-4o's 128k context
+CSV_PROMPT_TOKEN_LIMIT = 120_000
+
+# Models tried in order for small CSVs, the next one is only called when an answer is
+# missing the expected sections; larger CSVs go straight to the last model
+MODEL_CASCADE = ["gpt-4o-mini", "gpt-4o"]
+
+# A CSV is small (starts at the cheapest model) below either of these sizes
+CSV_SMALL_MAX_COLUMNS = 5
+CSV_SMALL_MAX_ROWS = 500
+
+# Fixed sampling seed so repeated analyses of the same data are reproducible
+CSV_ANALYSIS_SEED = 42
+
+# The three sections the CSV analysis prompts ask for, in order
+CSV_ANALYSIS_SECTIONS = re.compile(
+    r"### (Summary|요약).*### (Key Insights|주요 인사이트).*### (Top 3|상위 3)", re.S
+)
+
+
+def csv_upload_error(file):
+    """Validate an uploaded CSV file, returns an error message or None"""
+    if file.filename == "":
+        logger.warning("Empty filename provided")
+        return "No file selected"
+    if not file.filename.endswith(".csv"):
+        logger.warning("Invalid file type: %s", file.filename)
+        return "File must be a CSV"
+    return None
+
+
+def stream_digest(stream):
+    """Hash an upload stream in blocks and rewind it, returns the hex digest"""
+    digest = hashlib.blake2b(digest_size=16)
+    for block in iter(lambda: stream.read(1 << 20), b""):
+        digest.update(block)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def csv_stats_text(df_head, total_rows, stats=None):
+    """Schema plus per-column numeric stats for the prompt, far fewer tokens than sending more rows"""
+    columns = ", ".join(f"{name} ({dtype})" for name, dtype in df_head.dtypes.astype(str).items())
+    csv_stats = f"Total rows: {total_rows}, Total columns: {len(df_head.columns)}\nColumns: {columns}"
+    if stats is not None:
+        csv_stats += f"\n\nNumeric column stats:\n{stats.to_csv(float_format='%.8g').rstrip()}"
+    return csv_stats
+
+
+def numeric_stats(index, shift, count, sum_, sum_sq, minimum, maximum):
+    """Mean/std/min/max per column from running totals of values shifted by `shift`"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return pd.DataFrame({
+            "mean": shift + sum_ / count,
+            "std": np.sqrt((sum_sq - sum_ ** 2 / count) / (count - 1)),
+            "min": minimum,
+            "max": maximum,
+        }, index=index).rename_axis("column")
+
+
+def summarize_csv(stream):
+    """Parse an uploaded CSV, returns (sample DataFrame, total rows, schema + stats text for the prompt)"""
+    try:
+        return summarize_csv_arrow(stream)
+    except pa.ArrowInvalid as e:
+        # Arrow fixes column types from the first block, pandas re-infers them per chunk
+        logger.info("Arrow could not parse the CSV, falling back to pandas: %s", e)
+        stream.seek(0)
+        return summarize_csv_pandas(stream)
+
+
+def summarize_csv_arrow(stream):
+    """summarize_csv with Arrow's incremental reader, stats are computed on each block without pandas"""
+    reader = pacsv.open_csv(stream, read_options=pacsv.ReadOptions(block_size=CSV_BLOCK_SIZE))
+    names = reader.schema.names
+    if len(set(names)) != len(names):
+        # pandas renames repeated headers ("a", "a.1"), Arrow would keep both under the same name
+        raise pa.ArrowInvalid(f"Duplicate column names: {names}")
+    numeric_indices = [
+        i for i, field in enumerate(reader.schema)
+        if pa.types.is_integer(field.type) or pa.types.is_floating(field.type)
+    ]
+
+    # Numeric stats accumulate sums shifted by the first block's mean (numerically stable variance)
+    width = len(numeric_indices)
+    shift = None
+    count, sum_, sum_sq = np.zeros(width), np.zeros(width), np.zeros(width)
+    minimum, maximum = np.full(width, np.nan), np.full(width, np.nan)
+    head = []
+    total_rows = 0
+
+    for batch in reader:
+        if total_rows < CSV_SAMPLE_ROWS:
+            head.append(batch.slice(0, CSV_SAMPLE_ROWS - total_rows))
+        total_rows += batch.num_rows
+        if not batch.num_rows:
+            continue
+
+        columns = [pc.cast(batch.column(i), pa.float64()) for i in numeric_indices]
+        if shift is None:
+            shift = np.array([pc.mean(column).as_py() or 0.0 for column in columns])
+        for i, column in enumerate(columns):
+            shifted = pc.subtract(column, shift[i])
+            count[i] += pc.count(column).as_py()
+            sum_[i] += pc.sum(shifted).as_py() or 0.0
+            sum_sq[i] += pc.sum(pc.multiply(shifted, shifted)).as_py() or 0.0
+            extremes = pc.min_max(column).as_py()
+            minimum[i] = np.fmin(minimum[i], np.nan if extremes["min"] is None else extremes["min"])
+            maximum[i] = np.fmax(maximum[i], np.nan if extremes["max"] is None else extremes["max"])
+
+    # Only the sample rows are converted to pandas
+    df_head = pa.Table.from_batches(head, schema=reader.schema).to_pandas()
+    logger.info("CSV parsed successfully - Rows: %d, Columns: %d", total_rows, len(df_head.columns))
+
+    stats = None
+    if width and shift is not None:
+        numeric_columns = [names[i] for i in numeric_indices]
+        stats = numeric_stats(numeric_columns, shift, count, sum_, sum_sq, minimum, maximum)
+    return df_head, total_rows, csv_stats_text(df_head, total_rows, stats)
+
+
+def summarize_csv_pandas(stream):
+    """summarize_csv with pandas' chunked C parser"""
+    # Single pass over the upload stream in chunks, only the running totals and the sample are
+    # kept so memory stays flat however large the file is
+    reader = pd.read_csv(stream, engine="c", chunksize=CSV_CHUNK_ROWS)
+    first = next(reader)
+    df_head = first.head(CSV_SAMPLE_ROWS)
+
+    # Numeric stats accumulate sums shifted by the first chunk's mean (numerically stable variance)
+    numeric_columns = first.select_dtypes("number").columns
+    shift = first[numeric_columns].mean().fillna(0.0)
+    count = sum_ = sum_sq = minimum = maximum = None
+    total_rows = 0
+
+    for chunk in itertools.chain([first], reader):
+        total_rows += len(chunk)
+        if not len(numeric_columns):
+            continue
+
+        values = chunk[numeric_columns].apply(pd.to_numeric, errors="coerce")
+        shifted = values - shift
+        if count is None:
+            count, sum_, sum_sq = values.count(), shifted.sum(), (shifted ** 2).sum()
+            minimum, maximum = values.min(), values.max()
+        else:
+            count += values.count()
+            sum_ += shifted.sum()
+            sum_sq += (shifted ** 2).sum()
+            minimum = np.fmin(minimum, values.min())
+            maximum = np.fmax(maximum, values.max())
+
+    logger.info("CSV parsed successfully - Rows: %d, Columns: %d", total_rows, len(df_head.columns))
+
+    stats = None
+    if count is not None:
+        stats = numeric_stats(numeric_columns, shift, count, sum_, sum_sq, minimum, maximum)
+    return df_head, total_rows, csv_stats_text(df_head, total_rows, stats)
+
+
+def fit_csv_preview(df_head, build_prompt, token_limit, model="gpt-4o"):
+    """
+    Build the prompt with as many preview rows as fit in token_limit.
+    build_prompt(csv_preview) returns the prompt text, returns (prompt, rows) or None if even the header doesn't fit.
+    """
+    prompt = build_prompt(df_head.to_csv(index=False))
+    if count_tokens(model, prompt) < token_limit:
+        return prompt, len(df_head)
+
+    # Binary search for the largest row count that fits, the prompt grows with every row
+    best = None
+    low, high = 0, len(df_head) - 1
+    while low <= high:
+        rows = (low + high) // 2
+        prompt = build_prompt(df_head.head(rows).to_csv(index=False))
+        if count_tokens(model, prompt) < token_limit:
+            best = (prompt, rows)
+            low = rows + 1
+        else:
+            high = rows - 1
+
+    if best:
+        logger.info("Trimmed CSV preview to %d rows to fit %d prompt tokens", best[1], token_limit)
+    return best
+
+
+def csv_models(total_rows, column_count):
+    """Models to try for a CSV analysis, the whole cascade for small files, else only the last model"""
+    if column_count < CSV_SMALL_MAX_COLUMNS or total_rows < CSV_SMALL_MAX_ROWS:
+        return MODEL_CASCADE
+    return MODEL_CASCADE[-1:]
+
+
+def csv_data_preview(df_head):
+    """Column names plus a 2D list of rows, converted through Arrow (nulls come out as None)"""
+    table = pa.Table.from_pandas(df_head, preserve_index=False)
+    columns = [column.to_pylist() for column in table.columns]
+    return {
+        "columns": table.column_names,
+        "rows": [list(row) for row in zip(*columns)],
+    }
+
+
 @app.route("/api/analyze-csv", methods=["POST"])
 def analyze_csv():
     logger.info("CSV analysis request received")
@@ -175,141 +401,293 @@ def analyze_csv():
             return jsonify({"error": "No file provided"}), 400
 
         file = request.files["file"]
-        if file.filename == "":
-            logger.warning("Empty filename provided")
-            return jsonify({"error": "No file selected"}), 400
-
-        if not file.filename.endswith(".csv"):
-            logger.warning(f"Invalid file type: {file.filename}")
-            return jsonify({"error": "File must be a CSV"}), 400
+        error = csv_upload_error(file)
+        if error:
+            return jsonify({"error": error}), 400
 
         # Get language from request
         language = request.form.get("language", "en")
-        logger.info(f"Processing CSV file: {file.filename} (language: {language})")
-
-        # Read CSV file
-        csv_content = file.read().decode("utf-8")
-        logger.debug(f"CSV content length: {len(csv_content)} bytes")
-
-        # Parse CSV with pandas
-        df = pd.read_csv(io.StringIO(csv_content))
-        logger.info(f"CSV parsed successfully - Rows: {len(df)}, Columns: {len(df.columns)}")
-
-        # Convert DataFrame to string representation
-        csv_preview = df.head(20).to_string(index=False)
-        csv_stats = f"Total rows: {len(df)}, Total columns: {len(df.columns)}\nColumns: {', '.join(df.columns.tolist())}"
+        logger.info("Processing CSV file: %s (language: %s)", file.filename, language)
 
-        # Create prompt for OpenAI based on language
-        if language == "ko":
-            prompt = f"""당신은 AstraSemi Corporation 직원들이 운영 데이터를 이해하도록 돕는 AI 어시스턴트입니다.
-
-다음 반도체 운영 파일의 CSV 데이터를 분석하세요:
+        # Re-uploads of an identical file are answered from the cache without parsing it again
+        cache_key = response_cache_key("analyze-csv", MODEL_CASCADE, language, stream_digest(file.stream))
+        cached = cached_chat_response(
+            "analyze_csv", cache_key, "analysis", wants_stream(), ("data_preview", "total_rows", "columns")
+        )
+        if cached is not None:
+            return cached
+
+        df_head, total_rows, csv_stats = summarize_csv(file.stream)
+
+        # Create prompt for OpenAI based on language, with as many preview rows as fit the budget
+        lang = prompt_language(language)
+        template = USER_PROMPTS["analyze-csv", lang]
+        fitted = fit_csv_preview(
+            df_head,
+            lambda csv_preview: template.format_map({"csv_stats": csv_stats, "csv_preview": csv_preview}),
+            CSV_PROMPT_TOKEN_LIMIT,
+        )
+        if fitted is None:
+            logger.warning("CSV too large to analyze: %s", file.filename)
+            return jsonify({"error": "CSV file is too large to analyze"}), 400
+        prompt, _ = fitted
+
+        messages = [
+            SYSTEM_MESSAGES["analyze-csv", lang],
+            {"role": "user", "content": prompt},
+        ]
+
+        # The data preview goes out first when streaming, so the table renders while the analysis streams
+        return run_chat(
+            "analyze_csv",
+            model=csv_models(total_rows, len(df_head.columns)),
+            messages=messages,
+            max_tokens=1500,
+            temperature=0.7,
+            result_key="analysis",
+            error="An error occurred while analyzing the CSV file",
+            cache_key=cache_key,
+            stream=wants_stream(),
+            first_event={
+                "data_preview": csv_data_preview(df_head),
+                "total_rows": total_rows,
+                "columns": df_head.columns.tolist(),
+            },
+            accept=CSV_ANALYSIS_SECTIONS.search,
+            seed=CSV_ANALYSIS_SEED,
+        )
 
-{csv_stats}
+    except Exception as e:
+        logger.error("Error in CSV analysis: %s", e, exc_info=True)
+        return jsonify({"error": "An error occurred while analyzing the CSV file"}), 500
 
-CSV 데이터:
-{csv_preview}
 
-다음 형식으로 정확하게 응답하세요:
+@app.route("/api/analyze-csv/batch", methods=["POST"])
+def analyze_csv_batch():
+    """
+    Analyze several CSV files with a single chat completion
+    Form data: file (repeated, up to CSV_BATCH_MAX_FILES), language
+    """
+    logger.info("Batch CSV analysis request received")
 
-### 요약
-[이 데이터가 무엇을 나타내는지 간략하고 명확한 요약을 2-3문장으로 작성]
+    try:
+        files = request.files.getlist("file")
+        if not files:
+            logger.warning("No files provided in request")
+            return jsonify({"error": "No file provided"}), 400
 
-### 주요 인사이트
-- [첫 번째 중요한 인사이트]
-- [두 번째 중요한 인사이트]
-- [세 번째 중요한 인사이트]
-- [네 번째 중요한 인사이트]
-- [다섯 번째 중요한 인사이트]
+        if len(files) > CSV_BATCH_MAX_FILES:
+            logger.warning("Too many files in batch: %d", len(files))
+            return jsonify({"error": f"At most {CSV_BATCH_MAX_FILES} files per batch"}), 400
 
-### 상위 3개 조치사항
-1. [첫 번째 조치사항 - 구체적이고 실행 가능해야 함]
-2. [두 번째 조치사항 - 구체적이고 실행 가능해야 함]
-3. [세 번째 조치사항 - 구체적이고 실행 가능해야 함]
+        for file in files:
+            error = csv_upload_error(file)
+            if error:
+                return jsonify({"error": error}), 400
 
-위 형식을 정확히 따라 응답하세요. 마크다운 형식을 사용하고 깔끔하게 구조화하세요."""
-        else:
-            prompt = f"""You are an AI assistant helping AstraSemi Corporation employees understand operational data.
+        language = request.form.get("language", "en")
+        logger.info("Processing %d CSV files (language: %s)", len(files), language)
+
+        # One numbered sub-prompt per file, answered under the matching task_N key,
+        # each file gets an equal share of the prompt budget
+        summaries = []
+        tasks = []
+        for i, file in enumerate(files, 1):
+            df_head, total_rows, csv_stats = summarize_csv(file.stream)
+            header = f"### Task {i} CSV: {file.filename}\n{csv_stats}\n\nCSV Data:\n"
+            fitted = fit_csv_preview(
+                df_head,
+                lambda csv_preview, header=header: header + csv_preview,
+                CSV_PROMPT_TOKEN_LIMIT // len(files),
+            )
+            if fitted is None:
+                logger.warning("CSV too large to analyze: %s", file.filename)
+                return jsonify({"error": f"CSV file is too large to analyze: {file.filename}"}), 400
+            summaries.append((file.filename, df_head, total_rows))
+            tasks.append(fitted[0])
+
+        prompt = "\n".join(tasks)
+
+        def parse_results(content):
+            analyses = orjson.loads(content)
+            return [
+                {
+                    "fileName": filename,
+                    "analysis": analyses.get(f"task_{i}", ""),
+                    "data_preview": csv_data_preview(df_head),
+                    "total_rows": total_rows,
+                    "columns": df_head.columns.tolist(),
+                }
+                for i, (filename, df_head, total_rows) in enumerate(summaries, 1)
+            ]
 
-Analyze the following CSV data from a semiconductor operations file:
+        return run_chat(
+            "analyze_csv_batch",
+            model="gpt-4o",
+            messages=[
+                SYSTEM_MESSAGES["analyze-csv-batch", prompt_language(language)],
+                {"role": "user", "content": prompt},
+            ],
+            max_tokens=1500 * len(files),
+            temperature=0.7,
+            result_key="results",
+            error="An error occurred while analyzing the CSV files",
+            parse=parse_results,
+            response_format={"type": "json_object"},
+        )
 
-{csv_stats}
+    except Exception as e:
+        logger.error("Error in batch CSV analysis: %s", e, exc_info=True)
+        return jsonify({"error": "An error occurred while analyzing the CSV files"}), 500
+
+
+# Tag on the batches this app submits, /api/batch-status only reports tagged batches so it
+# can't be used to read other batches on the same OpenAI account
+BATCH_METADATA = {"source": "astrasemi-csv-analysis"}
+
+
+def submit_batch(prompts, model, system_message, max_tokens, temperature=0.7):
+    """Submit one chat completion per prompt to the OpenAI Batch API (custom_id task_1..task_N)"""
+    lines = [
+        orjson.dumps({
+            "custom_id": f"task_{i}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": model,
+                "messages": [system_message, {"role": "user", "content": prompt}],
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+            },
+        })
+        for i, prompt in enumerate(prompts, 1)
+    ]
 
-CSV Data:
-{csv_preview}
+    batch_file = client.files.create(file=("batch.jsonl", b"\n".join(lines)), purpose="batch")
+    return client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+        metadata=BATCH_METADATA,
+    )
 
-Please provide your analysis in EXACTLY this format:
 
-### Summary
-[Write a brief, clear summary of what this data represents in 2-3 sentences]
+@app.route("/api/analyze-csv/async", methods=["POST"])
+def analyze_csv_async():
+    """
+    Queue CSV analyses on the OpenAI Batch API (half price, results within 24h)
+    Form data: file (repeated, up to CSV_BATCH_MAX_FILES), language
+    Poll /api/batch-status/<batch_id> for the results
+    """
+    logger.info("Async CSV analysis request received")
 
-### Key Insights
-- [First important insight or pattern you notice]
-- [Second important insight or pattern]
-- [Third important insight or pattern]
-- [Fourth important insight or pattern]
-- [Fifth important insight or pattern]
+    try:
+        files = request.files.getlist("file")
+        if not files:
+            logger.warning("No files provided in request")
+            return jsonify({"error": "No file provided"}), 400
 
-### Top 3 Action Items
-1. [First action item - be specific and actionable]
-2. [Second action item - be specific and actionable]
-3. [Third action item - be specific and actionable]
+        if len(files) > CSV_BATCH_MAX_FILES:
+            logger.warning("Too many files in batch: %d", len(files))
+            return jsonify({"error": f"At most {CSV_BATCH_MAX_FILES} files per batch"}), 400
 
-Follow this format exactly. Use markdown formatting and keep it clean and well-structured."""
+        for file in files:
+            error = csv_upload_error(file)
+            if error:
+                return jsonify({"error": error}), 400
 
-        # Call OpenAI API
         if not client:
             logger.error("OpenAI client not initialized")
             return jsonify({"error": "OpenAI API not configured"}), 500
 
-        logger.info("Calling OpenAI API for CSV analysis")
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful AI assistant specializing in semiconductor operations analysis.",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.7,
-            max_tokens=1500,
-        )
+        language = request.form.get("language", "en")
+        lang = prompt_language(language)
+        template = USER_PROMPTS["analyze-csv", lang]
+
+        prompts = []
+        tasks = []
+        for i, file in enumerate(files, 1):
+            df_head, total_rows, csv_stats = summarize_csv(file.stream)
+            fitted = fit_csv_preview(
+                df_head,
+                lambda csv_preview, csv_stats=csv_stats: template.format_map(
+                    {"csv_stats": csv_stats, "csv_preview": csv_preview}
+                ),
+                CSV_PROMPT_TOKEN_LIMIT,
+            )
+            if fitted is None:
+                logger.warning("CSV too large to analyze: %s", file.filename)
+                return jsonify({"error": f"CSV file is too large to analyze: {file.filename}"}), 400
+            prompts.append(fitted[0])
+            tasks.append({"taskId": f"task_{i}", "fileName": file.filename, "total_rows": total_rows})
+
+        batch = submit_batch(prompts, "gpt-4o", SYSTEM_MESSAGES["analyze-csv", lang], max_tokens=1500)
+        logger.info("Submitted batch %s with %d CSV analyses", batch.id, len(prompts))
+
+        return jsonify({"success": True, "batch_id": batch.id, "status": batch.status, "tasks": tasks})
 
-        # Extract token usage and calculate cost
-        usage = response.usage
-        input_tokens = usage.prompt_tokens
-        output_tokens = usage.completion_tokens
-        total_tokens = usage.total_tokens
+    except Exception as e:
+        logger.error("Error submitting async CSV analysis: %s", e, exc_info=True)
+        return jsonify({"error": "An error occurred while submitting the CSV analysis"}), 500
 
-        input_cost = input_tokens * INPUT_TOKEN_PRICE
-        output_cost = output_tokens * OUTPUT_TOKEN_PRICE
-        total_cost = input_cost + output_cost
 
-        logger.info(
-            f"Token usage - Input: {input_tokens:,}, Output: {output_tokens:,}, "
-            f"Total: {total_tokens:,}, Cost: ${total_cost:.6f}"
-        )
+@app.route("/api/batch-status/<batch_id>", methods=["GET"])
+def batch_status(batch_id):
+    """
+    Check an OpenAI batch, returns the per-task results once it has completed
+    """
+    try:
+        if not client:
+            logger.error("OpenAI client not initialized")
+            return jsonify({"error": "OpenAI API not configured"}), 500
 
-        analysis = response.choices[0].message.content
+        try:
+            batch = client.batches.retrieve(batch_id)
+        except NotFoundError:
+            batch = None
+        if batch is None or (batch.metadata or {}).get("source") != BATCH_METADATA["source"]:
+            logger.warning("Batch not found: %s", batch_id)
+            return jsonify({"error": "Batch not found"}), 404
 
-        # Parse the CSV data for display
-        df_preview = df.head(10).fillna("")
-        data_preview = df_preview.to_dict("records")
+        result = {
+            "success": True,
+            "batch_id": batch.id,
+            "status": batch.status,
+            "request_counts": batch.request_counts.model_dump() if batch.request_counts else None,
+        }
 
-        logger.info(f"CSV analysis completed successfully ({len(analysis)} characters)")
+        if batch.status != "completed":
+            return jsonify(result)
 
-        return jsonify({
-            "success": True,
-            "analysis": analysis,
-            "data_preview": data_preview,
-            "total_rows": len(df),
-            "columns": df.columns.tolist(),
-        })
+        # Successful requests are written to the output file and failed ones to the error file,
+        # lines come back in any order, one per custom_id
+        results = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in client.files.content(file_id).content.splitlines():
+                if not line.strip():
+                    continue
+                item = orjson.loads(line)
+                response = item.get("response") or {}
+                if response.get("status_code") == 200:
+                    results.append({
+                        "taskId": item["custom_id"],
+                        "analysis": response["body"]["choices"][0]["message"]["content"],
+                    })
+                else:
+                    results.append({"taskId": item["custom_id"], "error": item.get("error") or response.get("body")})
+
+        # task_2 before task_10
+        results.sort(key=lambda r: (len(r["taskId"]), r["taskId"]))
+        logger.info("Batch %s completed with %d results", batch_id, len(results))
+
+        result["results"] = results
+        return jsonify(result)
 
     except Exception as e:
-        logger.error(f"Error in CSV analysis: {str(e)}", exc_info=True)
-        return jsonify({"error": "An error occurred while analyzing the CSV file"}), 500
+        logger.error("Error checking batch status: %s", e, exc_info=True)
+        return jsonify({"error": "An error occurred while checking the batch status"}), 500
 
 
 @app.route("/api/interpret-text", methods=["POST"])
@@ -332,73 +710,29 @@ def interpret_text():
             logger.warning("Empty text provided")
             return jsonify({"error": "Text is empty"}), 400
 
-        logger.info(f"Processing text interpretation (language: {language}, length: {len(text)})")
+        logger.info("Processing text interpretation (language: %s, length: %d)", language, len(text))
 
         # Prepare prompt for AI based on language
-        if language == "ko":
-            prompt = f"""다음 반도체 작업 관련 텍스트 메시지를 해석하세요. 다음을 제공하세요:
-
-1. 명확하고 간단한 요약
-2. 초보자 친화적인 언어로 설명된 주요 포인트
-3. 유용한 경우 제안된 후속 조치
-
-텍스트:
-{text}
-
-마크다운 형식으로 깔끔하게 구조화된 응답을 제공하세요."""
-        else:
-            prompt = f"""Interpret the following semiconductor work-related text message. Provide:
-
-1. A clear and simple summary
-2. Key points explained in beginner-friendly language
-3. Suggested follow-up actions if useful
-
-Text:
-{text}
-
-Provide a clean, well-structured response in markdown format."""
+        lang = prompt_language(language)
+        prompt = USER_PROMPTS["interpret-text", lang].format_map({"text": text})
 
-        # Call OpenAI API
-        if not client:
-            logger.error("OpenAI client not initialized")
-            return jsonify({"error": "OpenAI API not configured"}), 500
-
-        logger.info("Calling OpenAI API for text interpretation")
-        response = client.chat.completions.create(
+        return run_chat(
+            "interpret_text",
             model="gpt-4o-mini",
             messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful assistant that interprets semiconductor work messages, focusing on clear communication.",
-                },
+                SYSTEM_MESSAGES["interpret-text", lang],
                 {"role": "user", "content": prompt},
             ],
             max_tokens=1000,
             temperature=0.5,
+            result_key="interpretation",
+            error="An error occurred while interpreting the text",
+            cache_key=response_cache_key("interpret-text", "gpt-4o-mini", language, prompt),
+            stream=wants_stream(),
         )
 
-        # Extract token usage and calculate cost
-        usage = response.usage
-        input_tokens = usage.prompt_tokens
-        output_tokens = usage.completion_tokens
-        total_tokens = usage.total_tokens
-
-        input_cost = input_tokens * INPUT_TOKEN_PRICE
-        output_cost = output_tokens * OUTPUT_TOKEN_PRICE
-        total_cost = input_cost + output_cost
-
-        logger.info(
-            f"Token usage - Input: {input_tokens:,}, Output: {output_tokens:,}, "
-            f"Total: {total_tokens:,}, Cost: ${total_cost:.6f}"
-        )
-
-        interpretation = response.choices[0].message.content.strip()
-        logger.info(f"Text interpretation completed successfully ({len(interpretation)} characters)")
-
-        return jsonify({"success": True, "interpretation": interpretation})
-
     except Exception as e:
-        logger.error(f"Error in text interpretation: {str(e)}", exc_info=True)
+        logger.error("Error in text interpretation: %s", e, exc_info=True)
         return jsonify({"error": "An error occurred while interpreting the text"}), 500
 
 
@@ -420,123 +754,208 @@ def convert_text():
         language = data.get("language", "en")
 
         if convert_type not in ["email", "update"]:
-            logger.warning(f"Invalid conversion type: {convert_type}")
+            logger.warning("Invalid conversion type: %s", convert_type)
             return jsonify({"error": "Invalid conversion type"}), 400
 
-        logger.info(f"Processing text conversion (type: {convert_type}, language: {language}, length: {len(text)})")
+        logger.info("Processing text conversion (type: %s, language: %s, length: %d)", convert_type, language, len(text))
 
         # Prepare prompt for AI based on language and type
-        if language == "ko":
-            if convert_type == "email":
-                prompt = f"""다음 반도체 작업 관련 텍스트를 전문적인 이메일로 변환하세요.
+        lang = prompt_language(language)
+        prompt = USER_PROMPTS[f"convert-{convert_type}", lang].format_map({"text": text})
 
-원본 텍스트:
-{text}
+        return run_chat(
+            "convert_text",
+            model="gpt-4o-mini",
+            messages=[
+                SYSTEM_MESSAGES["convert-text", lang],
+                {"role": "user", "content": prompt},
+            ],
+            max_tokens=1000,
+            temperature=0.5,
+            result_key="converted",
+            error="An error occurred while converting the text",
+            cache_key=response_cache_key("convert-text", "gpt-4o-mini", language, prompt),
+            stream=wants_stream(),
+        )
 
-전문적인 이메일 형식으로 작성하세요 (제목, 인사말, 본문, 맺음말 포함)."""
-            else:  # update
-                prompt = f"""다음 반도체 작업 관련 텍스트를 간결한 관리자 친화적인 업데이트로 변환하세요.
+    except Exception as e:
+        logger.error("Error in text conversion: %s", e, exc_info=True)
+        return jsonify({"error": "An error occurred while converting the text"}), 500
 
-원본 텍스트:
-{text}
 
-핵심 정보에 초점을 맞춘 간결하고 명확한 업데이트를 작성하세요."""
-        else:
-            if convert_type == "email":
-                prompt = f"""Convert the following semiconductor work-related text into a professional email.
+# ============================================================================
+# MODULE 4: GLOSSARY ENDPOINTS
+# ============================================================================
 
-Original text:
-{text}
+GLOSSARY_FILE = os.path.join(os.path.dirname(__file__), "data", "glossary_terms.json")
 
-Write it in professional email format (with subject, greeting, body, and closing)."""
-            else:  # update
-                prompt = f"""Convert the following semiconductor work-related text into a concise manager-friendly update.
+# Search fields (matched casefolded) and their score weights
+SEARCH_FIELDS = (("term", 1.0), ("shortDefinition", 0.7), ("detailedDefinition", 0.5))
+SEARCH_THRESHOLD = 0.3  # Minimum weighted score for a term to be included
 
-Original text:
-{text}
+# Glossary data and search indexes, (re)built by load_glossary()
+GLOSSARY_DATA = None
+_TERM_BY_ID = {}
+_EXACT_TERMS = {}
+_SORTED_TERMS = []
+_AVAILABLE_TERMS_PREFIX = ""
+_FIELD_ARRAYS = []
+_CATEGORY_ARRAY = None
+_BY_CATEGORY = {}
+_FIELD_LENGTHS = []
 
-Write a brief, clear update focused on key information."""
 
-        # Call OpenAI API
-        if not client:
-            logger.error("OpenAI client not initialized")
-            return jsonify({"error": "OpenAI API not configured"}), 500
+def load_glossary():
+    """Load glossary data and rebuild the search indexes"""
+    global GLOSSARY_DATA, _TERM_BY_ID, _EXACT_TERMS, _SORTED_TERMS, _AVAILABLE_TERMS_PREFIX
+    global _FIELD_ARRAYS, _CATEGORY_ARRAY, _BY_CATEGORY, _FIELD_LENGTHS
 
-        logger.info("Calling OpenAI API for text conversion")
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful assistant that converts semiconductor messages into professional formats.",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            max_tokens=1000,
-            temperature=0.5,
-        )
+    try:
+        with open(GLOSSARY_FILE, "rb") as f:
+            GLOSSARY_DATA = orjson.loads(f.read())
+        logger.info("Loaded %d glossary terms", len(GLOSSARY_DATA["terms"]))
+    except Exception as e:
+        logger.error("Error loading glossary data: %s", e)
+        GLOSSARY_DATA = {"terms": [], "categories": []}
 
-        # Extract token usage and calculate cost
-        usage = response.usage
-        input_tokens = usage.prompt_tokens
-        output_tokens = usage.completion_tokens
-        total_tokens = usage.total_tokens
+    terms = GLOSSARY_DATA["terms"]
+    _TERM_BY_ID = {t["id"]: t for t in terms}
+
+    # Casefolded term names for exact-match (hash) and prefix (binary search) lookups
+    _EXACT_TERMS = {t["term"].casefold(): i for i, t in enumerate(terms)}
+    _SORTED_TERMS = sorted((t["term"].casefold(), i) for i, t in enumerate(terms))
+
+    # Term names listed in the related-terms prompt
+    _AVAILABLE_TERMS_PREFIX = ", ".join(t["term"] for t in terms[:50])
+
+    # One array per search field, aligned with GLOSSARY_DATA["terms"]
+    _FIELD_ARRAYS = [
+        np.array([t[field].casefold() for t in terms], dtype=str) for field, _ in SEARCH_FIELDS
+    ]
+    _CATEGORY_ARRAY = np.array([t["category"] for t in terms], dtype=str)
+
+    # Term indices per category, so category filters don't scan every term
+    by_category = defaultdict(list)
+    for i, t in enumerate(terms):
+        by_category[t["category"]].append(i)
+    _BY_CATEGORY = {cat: np.array(indices) for cat, indices in by_category.items()}
+
+    # Definition lengths, which bound the best fuzzy ratio a definition can reach
+    _FIELD_LENGTHS = [np.char.str_len(field) for field in _FIELD_ARRAYS[1:]]
+
+    _search_impl.cache_clear()
+
+
+def match_tiers(query_folded, choices):
+    """Exact (1.0) / starts with (0.9) / contains (0.7) tiers for every string in choices"""
+    return np.where(
+        choices == query_folded,
+        1.0,
+        np.where(
+            np.char.startswith(choices, query_folded),
+            0.9,
+            np.where(np.char.find(choices, query_folded) >= 0, 0.7, 0.0),
+        ),
+    )
+
+
+def term_name_tiers(query_folded):
+    """Same tiers as match_tiers() for every term name, using the name indexes"""
+    tiers = np.where(np.char.find(_FIELD_ARRAYS[0], query_folded) >= 0, 0.7, 0.0)
+
+    # Prefix matches are a contiguous run in the sorted names, found by binary search
+    start = bisect_left(_SORTED_TERMS, (query_folded,))
+    for name, i in _SORTED_TERMS[start:]:
+        if not name.startswith(query_folded):
+            break
+        tiers[i] = 0.9
+
+    exact = _EXACT_TERMS.get(query_folded)
+    if exact is not None:
+        tiers[exact] = 1.0
+
+    return tiers
+
+
+def search_candidates(query_folded):
+    """
+    Get indices of terms whose definitions can score above SEARCH_THRESHOLD: the definition contains
+    the query (a match tier), or is short enough for the fuzzy ratio to get there. The ratio is at most
+    2q / (q + L) for lengths q <= L, so a field of weight w needs L < q * (2w / SEARCH_THRESHOLD - 1).
+    """
+    candidates = np.zeros(len(GLOSSARY_DATA["terms"]), dtype=bool)
+    for field, lengths, (_, weight) in zip(_FIELD_ARRAYS[1:], _FIELD_LENGTHS, SEARCH_FIELDS[1:]):
+        max_length = len(query_folded) * (2 * weight / SEARCH_THRESHOLD - 1)
+        candidates |= (lengths < max_length) | (np.char.find(field, query_folded) >= 0)
+    return np.flatnonzero(candidates)
+
+
+def prefix_matches(query_folded, category):
+    """Terms whose name starts with the query in glossary order, returns ((term_id, score), ...)"""
+    matches = []
+    start = bisect_left(_SORTED_TERMS, (query_folded,))
+    for name, i in _SORTED_TERMS[start:]:
+        if not name.startswith(query_folded):
+            break
+        if not category or _CATEGORY_ARRAY[i] == category:
+            matches.append(i)
+
+    terms = GLOSSARY_DATA["terms"]
+    return tuple(
+        (terms[i]["id"], 1.0 if i == _EXACT_TERMS.get(query_folded) else 0.9)
+        for i in sorted(matches)[:20]
+    )
 
-        input_cost = input_tokens * INPUT_TOKEN_PRICE
-        output_cost = output_tokens * OUTPUT_TOKEN_PRICE
-        total_cost = input_cost + output_cost
 
-        logger.info(
-            f"Token usage - Input: {input_tokens:,}, Output: {output_tokens:,}, "
-            f"Total: {total_tokens:,}, Cost: ${total_cost:.6f}"
+@functools.lru_cache(maxsize=1024)
+def _search_impl(query_folded, category):
+    """Score glossary terms for a normalized query, returns ((term_id, score), ...)"""
+    # Fuzzy ratios against a single character are noise, so only match name prefixes
+    if len(query_folded) == 1:
+        return prefix_matches(query_folded, category)
+
+    # Term names are short and always scored; the long definition fields are only
+    # scored for the terms where they can change the result
+    candidate_indices = search_candidates(query_folded)
+    all_indices = np.arange(len(GLOSSARY_DATA["terms"]))
+    if category:
+        candidate_indices = np.intersect1d(
+            candidate_indices, _BY_CATEGORY.get(category, np.empty(0, dtype=int))
         )
 
-        converted = response.choices[0].message.content.strip()
-        logger.info(f"Text conversion completed successfully ({len(converted)} characters)")
+    # Lay out every string to score as one flat array (all names, then the candidates'
+    # short and detailed definitions) so RapidFuzz scores them in a single batch call
+    n, k = len(all_indices), len(candidate_indices)
+    choices = np.concatenate(
+        [_FIELD_ARRAYS[0]] + [field[candidate_indices] for field in _FIELD_ARRAYS[1:]]
+    )
+    weights = np.repeat([weight for _, weight in SEARCH_FIELDS], [n, k, k])
 
-        return jsonify({"success": True, "converted": converted})
+    # Exact / starts with / contains tiers, the fuzzy ratio (0 below 30) only when none of them matched
+    tiers = np.concatenate([term_name_tiers(query_folded), match_tiers(query_folded, choices[n:])])
+    fuzzy = process.cdist([query_folded], choices, scorer=fuzz.ratio, score_cutoff=30)[0] / 100.0
+    field_scores = np.where(tiers > 0, tiers, fuzzy) * weights
 
-    except Exception as e:
-        logger.error(f"Error in text conversion: {str(e)}", exc_info=True)
-        return jsonify({"error": "An error occurred while converting the text"}), 500
+    # Take the best weighted score across fields for each term
+    scores = field_scores[:n].copy()
+    scores[candidate_indices] = np.maximum(
+        scores[candidate_indices], field_scores[n:].reshape(len(SEARCH_FIELDS) - 1, k).max(axis=0)
+    )
 
+    # Skip terms whose category doesn't match the filter
+    if category:
+        scores[_CATEGORY_ARRAY != category] = 0.0
 
-# ============================================================================
-# MODULE 4: GLOSSARY ENDPOINTS
-# ============================================================================
+    # Threshold for inclusion, then keep the top 20 results by match score
+    matches = np.flatnonzero(scores > SEARCH_THRESHOLD)
+    if len(matches) > 20:
+        matches = np.sort(matches[np.argpartition(-scores[matches], 19)[:20]])
+    matches = matches[np.argsort(-scores[matches], kind="stable")]
+
+    return tuple((GLOSSARY_DATA["terms"][i]["id"], float(scores[i])) for i in matches)
 
-# Load glossary data
-GLOSSARY_DATA = None
-GLOSSARY_FILE = os.path.join(os.path.dirname(__file__), "data", "glossary_terms.json")
 
-try:
-    with open(GLOSSARY_FILE, "r", encoding="utf-8") as f:
-        GLOSSARY_DATA = json.load(f)
-    logger.info(f"Loaded {len(GLOSSARY_DATA['terms'])} glossary terms")
-except Exception as e:
-    logger.error(f"Error loading glossary data: {e}")
-    GLOSSARY_DATA = {"terms": [], "categories": []}
-
-
-def fuzzy_match_score(query, text):
-    """Calculate fuzzy match score between query and text"""
-    query_lower = query.lower()
-    text_lower = text.lower()
-    
-    # Exact match
-    if query_lower == text_lower:
-        return 1.0
-    
-    # Starts with
-    if text_lower.startswith(query_lower):
-        return 0.9
-    
-    # Contains
-    if query_lower in text_lower:
-        return 0.7
-    
-    # Use SequenceMatcher for fuzzy matching
-    return SequenceMatcher(None, query_lower, text_lower).ratio()
+load_glossary()
 
 
 @app.route("/api/glossary/search", methods=["GET"])
@@ -549,7 +968,7 @@ def search_glossary():
         query = request.args.get("q", "").strip()
         category = request.args.get("category", "").strip()
         
-        logger.debug(f"Glossary search - Query: '{query}', Category: '{category if category else 'None'}'")
+        logger.debug("Glossary search - Query: '%s', Category: '%s'", query, category if category else "None")
         
         if not GLOSSARY_DATA or not GLOSSARY_DATA["terms"]:
             logger.error("Glossary data not available")
@@ -559,42 +978,20 @@ def search_glossary():
         if not query:
             filtered_terms = GLOSSARY_DATA["terms"]
             if category:
-                filtered_terms = [t for t in filtered_terms if t["category"] == category]
-            logger.debug(f"No query - returning {len(filtered_terms)} terms")
+                filtered_terms = [filtered_terms[i] for i in _BY_CATEGORY.get(category, ())]
+            logger.debug("No query - returning %d terms", len(filtered_terms))
             return jsonify({
                 "success": True,
                 "terms": filtered_terms,
                 "categories": GLOSSARY_DATA["categories"]
             })
         
-        # Search with fuzzy matching
-        results = []
-        for term in GLOSSARY_DATA["terms"]:
-            # Skip if category filter doesn't match
-            if category and term["category"] != category:
-                continue
-            
-            # Calculate match scores for different fields
-            term_score = fuzzy_match_score(query, term["term"])
-            def_score = fuzzy_match_score(query, term["shortDefinition"]) * 0.7
-            detail_score = fuzzy_match_score(query, term["detailedDefinition"]) * 0.5
-            
-            # Take the highest score
-            max_score = max(term_score, def_score, detail_score)
-            
-            if max_score > 0.3:  # Threshold for inclusion
-                results.append({
-                    **term,
-                    "matchScore": max_score
-                })
-        
-        # Sort by match score
-        results.sort(key=lambda x: x["matchScore"], reverse=True)
-        
-        # Limit to top 20 results
-        results = results[:20]
+        results = [
+            {**_TERM_BY_ID[term_id], "matchScore": score}
+            for term_id, score in _search_impl(query.casefold(), category)
+        ]
         
-        logger.info(f"Glossary search found {len(results)} matching terms")
+        logger.info("Glossary search found %d matching terms", len(results))
         
         return jsonify({
             "success": True,
@@ -603,7 +1000,7 @@ def search_glossary():
         })
         
     except Exception as e:
-        logger.error(f"Error in glossary search: {str(e)}", exc_info=True)
+        logger.error("Error in glossary search: %s", e, exc_info=True)
         return jsonify({"error": "An error occurred while searching the glossary"}), 500
 
 
@@ -618,17 +1015,17 @@ def get_term(term_id):
             return jsonify({"error": "Glossary data not available"}), 500
         
         # Find the term
-        term = next((t for t in GLOSSARY_DATA["terms"] if t["id"] == term_id), None)
+        term = _TERM_BY_ID.get(term_id)
         
         if not term:
-            logger.warning(f"Term not found: {term_id}")
+            logger.warning("Term not found: %s", term_id)
             return jsonify({"error": "Term not found"}), 404
         
-        logger.debug(f"Found term: {term['term']}")
+        logger.debug("Found term: %s", term["term"])
         return jsonify({"success": True, "term": term})
         
     except Exception as e:
-        logger.error(f"Error getting term: {str(e)}", exc_info=True)
+        logger.error("Error getting term: %s", e, exc_info=True)
         return jsonify({"error": "An error occurred while retrieving the term"}), 500
 
 
@@ -648,78 +1045,31 @@ def ai_explain_term():
             logger.warning("No term provided for AI explanation")
             return jsonify({"error": "No term provided"}), 400
         
-        if not client:
-            logger.error("OpenAI client not initialized")
-            return jsonify({"error": "OpenAI API not configured"}), 500
-        
-        logger.info(f"AI explain request - Term: {term}, Language: {language}")
+        logger.info("AI explain request - Term: %s, Language: %s", term, language)
         
         # Prepare prompt based on language
-        if language == "ko":
-            system_prompt = """당신은 반도체 산업 분야의 전문가입니다. 복잡한 반도체 개념을 명확하고 실용적인 통찰력으로 설명하는 것을 전문으로 합니다."""
-            user_prompt = f"""'{term}' 용어에 대해 더 자세히 설명해주세요.
-
-배경: {context}
-
-다음을 포함하여 포괄적인 설명을 제공하세요:
-- 상세한 기술 설명
-- 반도체 제조에서의 실제 응용
-- 일반적인 과제 및 고려사항
-- 업계 모범 사례
-- 구체적인 예시 또는 비유
-
-명확하고 잘 구조화된 마크다운 형식으로 작성하세요."""
-        else:
-            system_prompt = """You are an expert in semiconductor industry. You specialize in explaining complex semiconductor concepts with clarity and practical insights."""
-            user_prompt = f"""Explain the term '{term}' in more detail.
-
-Context: {context}
-
-Provide a comprehensive explanation including:
-- Detailed technical description
-- Real-world applications in semiconductor manufacturing
-- Common challenges and considerations
-- Industry best practices
-- Specific examples or analogies
-
-Write in clear, well-structured markdown format."""
+        lang = prompt_language(language)
+        system_message = SYSTEM_MESSAGES["ai-explain", lang]
+        user_prompt = USER_PROMPTS["ai-explain", lang].format_map({"term": term, "context": context})
         
-        logger.info("Calling OpenAI for AI explanation")
-        response = client.chat.completions.create(
+        return run_chat(
+            "ai_explain_term",
             model="gpt-4o-mini",
             messages=[
-                {"role": "system", "content": system_prompt},
+                system_message,
                 {"role": "user", "content": user_prompt}
             ],
+            max_tokens=1000,
             temperature=0.7,
-            max_tokens=1000
+            result_key="explanation",
+            error="An error occurred while generating AI explanation",
+            cache_key=response_cache_key("ai-explain", "gpt-4o-mini", language, system_message["content"], user_prompt),
+            stream=wants_stream(),
+            token_usage=True,
         )
-        
-        explanation = response.choices[0].message.content.strip()
-        
-        # Track token usage
-        usage = response.usage
-        input_cost = usage.prompt_tokens * INPUT_TOKEN_PRICE
-        output_cost = usage.completion_tokens * OUTPUT_TOKEN_PRICE
-        total_cost = input_cost + output_cost
-        
-        logger.info(
-            f"AI explanation completed - Tokens: {usage.prompt_tokens} + {usage.completion_tokens}, "
-            f"Cost: ${total_cost:.6f}"
-        )
-        
-        return jsonify({
-            "success": True,
-            "explanation": explanation,
-            "tokenUsage": {
-                "inputTokens": usage.prompt_tokens,
-                "outputTokens": usage.completion_tokens,
-                "totalCost": total_cost
-            }
-        })
 
     except Exception as e:
-        logger.error(f"Error in AI explain: {str(e)}", exc_info=True)
+        logger.error("Error in AI explain: %s", e, exc_info=True)
         return jsonify({"error": "An error occurred while generating AI explanation"}), 500
 
 
@@ -738,100 +1088,68 @@ def get_related_terms():
             logger.warning("No term provided for related terms")
             return jsonify({"error": "No term provided"}), 400
         
-        if not client:
-            logger.error("OpenAI client not initialized")
-            return jsonify({"error": "OpenAI API not configured"}), 500
-        
-        logger.info(f"Related terms request - Term: {term}, Language: {language}")
-        
-        # Get list of available term IDs for validation
-        available_term_ids = [t["id"] for t in GLOSSARY_DATA["terms"]]
-        available_terms = [t["term"] for t in GLOSSARY_DATA["terms"]]
+        logger.info("Related terms request - Term: %s, Language: %s", term, language)
         
         # Prepare prompt based on language
-        if language == "ko":
-            system_prompt = """당신은 반도체 산업 전문가입니다. 관련 용어와 개념을 식별하는 데 능숙합니다."""
-            user_prompt = f"""반도체 용어 '{term}'과 관련된 5-7개의 관련 용어를 제안하세요.
-
-사용 가능한 용어: {", ".join(available_terms[:50])}... (및 기타)
-
-각 관련 용어에 대해 다음 형식으로 JSON 배열을 제공하세요:
-[
-  {{"termId": "term-id", "reason": "이 용어와 관련이 있는 이유 (1문장)"}}
-]
-
-응답은 유효한 JSON만 작성하세요."""
-        else:
-            system_prompt = """You are a semiconductor industry expert. You excel at identifying related terms and concepts."""
-            user_prompt = f"""Suggest 5-7 related terms for the semiconductor term '{term}'.
-
-Available terms: {", ".join(available_terms[:50])}... (and more)
-
-For each related term, provide a JSON array in this format:
-[
-  {{"termId": "term-id", "reason": "Why this is related (1 sentence)"}}
-]
-
-Respond with valid JSON only."""
+        lang = prompt_language(language)
+        system_message = SYSTEM_MESSAGES["related-terms", lang]
+        user_prompt = USER_PROMPTS["related-terms", lang].format_map({"term": term, "available_terms": _AVAILABLE_TERMS_PREFIX})
         
-        logger.info("Calling OpenAI for related terms")
-        response = client.chat.completions.create(
+        def parse_related(content):
+            # Remove markdown code fences if present
+            content = content.removeprefix("```json").removeprefix("```").removesuffix("```").strip()
+            related = orjson.loads(content.encode())
+
+            # Validate and filter term IDs
+            valid_related = [item for item in related if item.get("termId", "") in _TERM_BY_ID]
+            logger.info("Found %d valid related terms", len(valid_related))
+            return valid_related
+
+        return run_chat(
+            "get_related_terms",
             model="gpt-4o-mini",
             messages=[
-                {"role": "system", "content": system_prompt},
+                system_message,
                 {"role": "user", "content": user_prompt}
             ],
+            max_tokens=500,
             temperature=0.7,
-            max_tokens=500
+            result_key="relatedTerms",
+            error="An error occurred while retrieving related terms",
+            cache_key=response_cache_key("related-terms", "gpt-4o-mini", language, system_message["content"], user_prompt),
+            parse=parse_related,
+            token_usage=True,
         )
         
-        content = response.choices[0].message.content.strip()
-        
-        # Parse JSON response
-        # Remove markdown code blocks if present
-        if content.startswith("```"):
-            content = re.sub(r"```json\n?|```\n?", "", content)
-        
-        related = json.loads(content)
-        
-        # Validate and filter term IDs
-        valid_related = []
-        for item in related:
-            term_id = item.get("termId", "")
-            if term_id in available_term_ids:
-                valid_related.append(item)
-        
-        logger.info(f"Found {len(valid_related)} valid related terms")
-        
-        # Track token usage
-        usage = response.usage
-        input_cost = usage.prompt_tokens * INPUT_TOKEN_PRICE
-        output_cost = usage.completion_tokens * OUTPUT_TOKEN_PRICE
-        total_cost = input_cost + output_cost
-        
-        logger.info(
-            f"Related terms completed - Tokens: {usage.prompt_tokens} + {usage.completion_tokens}, "
-            f"Cost: ${total_cost:.6f}"
-        )
-        
-        return jsonify({
-            "success": True,
-            "relatedTerms": valid_related,
-            "tokenUsage": {
-                "inputTokens": usage.prompt_tokens,
-                "outputTokens": usage.completion_tokens,
-                "totalCost": total_cost
-            }
-        })
-        
     except Exception as e:
-        logger.error(f"Error getting related terms: {str(e)}", exc_info=True)
+        logger.error("Error getting related terms: %s", e, exc_info=True)
         return jsonify({"error": "An error occurred while retrieving related terms"}), 500
 
 
+def warmup():
+    """Pay one-time initialization costs at startup instead of on each worker's first request"""
+    pd.read_csv(io.StringIO("a,b\n1,2\n"))
+    pa.Table.from_pandas(pd.DataFrame({"a": [1]}))
+    get_enc("gpt-4o")
+    if client:
+        # Open a pooled connection to the API (TLS handshake), short timeout so startup doesn't hang
+        try:
+            client.with_options(timeout=5, max_retries=0).models.list()
+        except Exception as e:
+            logger.warning("OpenAI warmup request failed: %s", e)
+    logger.info("Warmup completed")
+
+
+if os.getenv("WARMUP", "true").lower() == "true":
+    warmup()
+
+
 if __name__ == "__main__":
-    logger.info("=" * 60)
-    logger.info("Starting Flask backend server")
-    logger.info(f"Running on: http://localhost:5001")
-    logger.info("=" * 60)
-    app.run(debug=True, port=5001)
+    # The Werkzeug server is for local development, production runs under gunicorn (gunicorn.conf.py)
+    debug = get_debug_flag()  # FLASK_DEBUG=1
+    if not debug:
+        logger.warning("Running the development server, use gunicorn in production")
+    logger.info("Starting Flask backend server on http://localhost:5001")
+    # Serve requests on separate threads so concurrent OpenAI calls don't queue behind each other,
+    # the debugger and reloader (which re-imports pandas/openai on every change) only with FLASK_DEBUG
+    app.run(debug=debug, port=5001, threaded=True)
@@ -0,0 +1,55 @@
+"""
+Token usage cost tracking.
+Completions are priced per model, with prompt tokens served from OpenAI's prompt cache
+billed at the discounted rate, so the logged cost matches what the account is charged.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Token pricing in dollars per token, (input, output)
+# https://openai.com/api/pricing/
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.150 / 1_000_000, 0.600 / 1_000_000),  # $0.150 / $0.600 per 1M tokens
+    "gpt-4o": (2.50 / 1_000_000, 10.00 / 1_000_000),  # $2.50 / $10.00 per 1M tokens
+}
+CACHED_INPUT_DISCOUNT = 0.5  # Prompt-cache hits are billed at half the input price
+
+
+def model_prices(model):
+    """(input, output) price per token for a model, dated snapshots use their base model's price"""
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        # Longest name first so "gpt-4o-mini-2024-07-18" doesn't match "gpt-4o"
+        base = max((name for name in MODEL_PRICES if model.startswith(name)), key=len, default="gpt-4o")
+        prices = MODEL_PRICES[base]
+    return prices
+
+
+def cached_tokens(usage):
+    """Number of prompt tokens served from OpenAI's prompt cache"""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (getattr(details, "cached_tokens", None) or 0) if details else 0
+
+
+def usage_cost(usage, model):
+    """Calculate the cost in dollars of a completion's token usage"""
+    input_price, output_price = model_prices(model)
+    cached = cached_tokens(usage)
+    return (
+        (usage.prompt_tokens - cached) * input_price
+        + cached * input_price * CACHED_INPUT_DISCOUNT
+        + usage.completion_tokens * output_price
+    )
+
+
+def log_usage(label, usage, model):
+    """Log token usage and cost for a completion, returns the cost in dollars"""
+    total_cost = usage_cost(usage, model)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "Token usage (%s, %s) - Input: %d (cached: %d), Output: %d, Total: %d, Cost: $%.6f",
+            label, model, usage.prompt_tokens, cached_tokens(usage), usage.completion_tokens,
+            usage.total_tokens, total_cost,
+        )
+    return total_cost
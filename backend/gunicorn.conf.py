@@ -0,0 +1,25 @@
+"""
+Gunicorn configuration for running the backend in production:
+
+    cd backend && gunicorn app:app
+
+gevent workers monkey-patch sockets before the app is imported, so requests blocked on
+OpenAI yield to other requests instead of holding the whole worker. Set
+GUNICORN_WORKER_CLASS=gthread to serve each worker's requests on a thread pool instead
+(GUNICORN_THREADS per worker), e.g. where gevent's monkey-patching isn't wanted.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5001")
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count()))
+# Workers inherit the environment, the app splits the account-wide OpenAI limits between them
+os.environ["GUNICORN_WORKERS"] = str(workers)
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gevent")
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+# Only used by gthread workers
+threads = int(os.getenv("GUNICORN_THREADS", "32"))
+
+# Longer than OPENAI_TIMEOUT so slow completions aren't killed mid-request
+timeout = 120
+graceful_timeout = 30
@@ -0,0 +1,295 @@
+"""
+Shared OpenAI chat completion path for the API endpoints.
+run_chat() owns everything between a built prompt and the Flask response: the response cache,
+rate limiting and the concurrency cap, streaming, usage/cost logging and error handling,
+so each endpoint only validates its input and builds its messages.
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import Counter
+
+import httpx
+import orjson
+from cachetools import TTLCache
+from dotenv import load_dotenv
+from flask import Response, jsonify, request, stream_with_context
+from openai import DefaultHttpxClient, OpenAI
+
+from costs import log_usage, usage_cost
+from ratelimit import TokenBucket
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# OpenAI client settings: one client (and connection pool) is shared by all request
+# threads, and the timeout keeps a slow call from holding a worker for the SDK's 10 min default
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+
+# Processes sharing the limits below, each one keeps to an equal share
+# (gunicorn.conf.py exports its worker count, the dev server is a single process)
+WORKER_PROCESSES = max(1, int(os.getenv("GUNICORN_WORKERS", "1")))
+
+# Cap on in-flight OpenAI calls across all request threads/greenlets and worker processes,
+# so a burst of traffic queues here instead of piling up against the OpenAI rate limits
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "50"))
+_openai_slots = threading.BoundedSemaphore(max(1, OPENAI_MAX_CONCURRENCY // WORKER_PROCESSES))
+
+# Account rate limits (requests and tokens per minute), calls are paced to stay under them
+OPENAI_RPM = int(os.getenv("OPENAI_RPM", "500"))
+OPENAI_TPM = int(os.getenv("OPENAI_TPM", "200000"))
+_rate_limiter = TokenBucket(max(1, OPENAI_RPM // WORKER_PROCESSES), max(1, OPENAI_TPM // WORKER_PROCESSES))
+
+# Initialize OpenAI client
+api_key = os.getenv("OPENAI_API_KEY")
+if api_key:
+    logger.info("OpenAI API key loaded successfully")
+    client = OpenAI(
+        api_key=api_key,
+        timeout=OPENAI_TIMEOUT,
+        http_client=DefaultHttpxClient(
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+            )
+        ),
+    )
+else:
+    logger.error("OpenAI API key not found in environment variables")
+    client = None
+
+# Response cache for the LLM endpoints, identical requests skip the API call
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "86400"))
+_response_cache = TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
+_response_cache_lock = threading.Lock()
+
+# How many model cascades per label were answered by the first model vs. escalated
+_escalations = Counter()
+_escalations_lock = threading.Lock()
+
+
+def response_cache_key(endpoint, model, language, *inputs):
+    """Build a cache key from the endpoint, model, language and prompt inputs"""
+    return hashlib.blake2b(orjson.dumps((endpoint, model, language, inputs)), digest_size=16).hexdigest()
+
+
+def get_cached_response(key):
+    """Get a cached response body, or None on a miss"""
+    with _response_cache_lock:
+        return _response_cache.get(key)
+
+
+def cache_response(key, result):
+    """Store a response body in the cache"""
+    with _response_cache_lock:
+        _response_cache[key] = result
+
+
+def estimate_tokens(messages, max_tokens):
+    """Rough token count for a request (~4 characters per token) plus the completion budget"""
+    chars = 0
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, str):
+            chars += len(content)
+        else:
+            chars += sum(len(part.get("text", "")) for part in content)
+    return chars // 4 + max_tokens
+
+
+def create_completion(**kwargs):
+    """Create a chat completion, waiting for a free slot if OPENAI_MAX_CONCURRENCY calls are in flight"""
+    _rate_limiter.acquire(estimate_tokens(kwargs["messages"], kwargs.get("max_tokens", 0)))
+    with _openai_slots:
+        return client.chat.completions.create(**kwargs)
+
+
+def wants_stream():
+    """Check whether the client asked for a Server-Sent Events response"""
+    return request.accept_mimetypes.best == "text/event-stream"
+
+
+def sse_response(events):
+    """Send an iterable of JSON-serializable events as Server-Sent Events"""
+    def generate():
+        for event in events:
+            yield b"data: " + orjson.dumps(event) + b"\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def stream_completion(label, on_complete=None, first_event=None, **kwargs):
+    """
+    Stream a chat completion to the client as Server-Sent Events.
+    first_event (if given) is sent before the completion, e.g. metadata the client renders right away.
+    Each token delta is sent as {"delta": "..."}, followed by {"done": true, "usage": {...}} at the end,
+    then on_complete(text, usage) is called with the full text once the stream finishes.
+    The concurrency slot is held until the response is closed.
+    """
+    _rate_limiter.acquire(estimate_tokens(kwargs["messages"], kwargs.get("max_tokens", 0)))
+    _openai_slots.acquire()
+    try:
+        response = client.chat.completions.create(
+            stream=True, stream_options={"include_usage": True}, **kwargs
+        )
+    except Exception:
+        _openai_slots.release()
+        raise
+
+    def events():
+        if first_event is not None:
+            yield first_event
+
+        parts = []
+        usage = None
+        try:
+            for chunk in response:
+                # The final chunk has no choices and carries the token usage
+                if chunk.usage:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield {"delta": chunk.choices[0].delta.content}
+        except Exception as e:
+            logger.error("Error while streaming completion: %s", e, exc_info=True)
+            yield {"error": "An error occurred while generating the response"}
+            return
+
+        text = "".join(parts).strip()
+        if usage:
+            log_usage(label, usage, kwargs["model"])
+        if on_complete:
+            on_complete(text, usage)
+
+        yield {"done": True, "usage": usage.model_dump(exclude_none=True) if usage else None}
+
+    streamed = sse_response(events())
+    streamed.call_on_close(_openai_slots.release)
+    return streamed
+
+
+def record_escalation(label, escalated):
+    """Count a model cascade for label and log its running escalation rate"""
+    with _escalations_lock:
+        _escalations[label, escalated] += 1
+        escalations, total = _escalations[label, True], _escalations[label, True] + _escalations[label, False]
+    logger.info("%s model cascade escalation rate: %d/%d (%.1f%%)", label, escalations, total, 100 * escalations / total)
+
+
+def cached_chat_response(label, cache_key, result_key, stream, event_keys=()):
+    """
+    Replay a cached run_chat result, None on a miss. A hit made no API call, so any tokenUsage is zeroed.
+    Streamed replays send the event_keys fields as the first event, then the cached text in one delta.
+    """
+    cached = get_cached_response(cache_key)
+    if cached is None:
+        return None
+
+    logger.info("Returning cached %s response", label)
+    if stream:
+        events = [{key: cached[key] for key in event_keys}] if event_keys else []
+        events += [{"delta": cached[result_key]}, {"done": True, "cache_hit": True}]
+        return sse_response(events)
+    result = {**cached, "cache_hit": True}
+    if "tokenUsage" in cached:
+        # A cache hit never reaches OpenAI, so it costs nothing
+        result["tokenUsage"] = {"inputTokens": 0, "outputTokens": 0, "totalCost": 0}
+    return jsonify(result)
+
+
+def run_chat(
+    label, *, model, messages, max_tokens, temperature, result_key, error,
+    cache_key=None, stream=False, first_event=None, accept=None, parse=None, token_usage=False, **kwargs,
+):
+    """
+    Run a chat completion for an endpoint and build its Flask response.
+    The body is {"success": true, result_key: text, **first_event}, with parse(text) in place of the
+    text if given (non-streaming only) and the token counts and cost under "tokenUsage" if token_usage.
+    model is a model name or a cascade of them, the next model is only called when accept(text)
+    rejects an answer (streamed text can't be taken back, so streams always use the first model
+    and a rejected streamed answer is sent but not cached).
+    Results are cached under cache_key if given, stream sends Server-Sent Events (first_event first),
+    extra kwargs go to the API call and failures return {"error": error}, 500.
+    """
+    event_keys = tuple(first_event or ())
+    if cache_key is not None:
+        cached = cached_chat_response(label, cache_key, result_key, stream, event_keys)
+        if cached is not None:
+            return cached
+
+    if not client:
+        logger.error("OpenAI client not initialized")
+        return jsonify({"error": "OpenAI API not configured"}), 500
+
+    models = [model] if isinstance(model, str) else list(model)
+
+    def build_result(text, usage, model):
+        result = {"success": True, result_key: parse(text) if parse else text, **(first_event or {})}
+        if token_usage:
+            result["tokenUsage"] = {
+                "inputTokens": usage.prompt_tokens,
+                "outputTokens": usage.completion_tokens,
+                "totalCost": usage_cost(usage, model),
+            }
+        return result
+
+    try:
+        if stream:
+            def on_complete(text, usage):
+                if cache_key is None or (token_usage and not usage):
+                    return
+                # A rejected answer isn't cached, so a later request still escalates
+                if len(models) > 1 and accept is not None and not accept(text):
+                    logger.warning("Streamed %s answer from %s was rejected, not caching it", label, models[0])
+                    return
+                cache_response(cache_key, build_result(text, usage, models[0]))
+
+            logger.info("Streaming OpenAI response for %s (%s)", label, models[0])
+            return stream_completion(
+                label,
+                on_complete,
+                first_event=first_event,
+                model=models[0],
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                **kwargs,
+            )
+
+        for name in models:
+            logger.info("Calling OpenAI for %s (%s)", label, name)
+            response = create_completion(
+                model=name,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                **kwargs,
+            )
+            log_usage(label, response.usage, name)
+
+            text = response.choices[0].message.content.strip()
+            if name == models[-1] or accept is None or accept(text):
+                break
+            logger.warning("%s answer from %s was rejected, escalating", label, name)
+
+        if len(models) > 1:
+            record_escalation(label, escalated=name != models[0])
+
+        result = build_result(text, response.usage, name)
+        logger.info("%s completed successfully (%d characters)", label, len(text))
+
+    except Exception as e:
+        logger.error("Error in %s: %s", label, e, exc_info=True)
+        return jsonify({"error": error}), 500
+
+    if cache_key is not None:
+        cache_response(cache_key, result)
+    return jsonify(result)
@@ -0,0 +1,55 @@
+"""
+Client-side rate limiting for OpenAI calls.
+Requests are paced to stay under the account's requests/min and tokens/min limits
+instead of being sent right away and retried after a 429.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket with a requests-per-minute and a tokens-per-minute budget, refilled continuously"""
+
+    def __init__(self, rpm, tpm):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def acquire(self, tokens):
+        """Block until one request and `tokens` tokens fit in the budget, returns seconds waited"""
+        # A single call larger than the whole budget can only wait for a full bucket
+        tokens = min(tokens, self.tpm)
+        waited = 0.0
+
+        while True:
+            with self._lock:
+                self._refill()
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    break
+                delay = max(
+                    (1 - self._requests) * 60 / self.rpm,
+                    (tokens - self._tokens) * 60 / self.tpm,
+                )
+            time.sleep(delay)
+            waited += delay
+
+        if waited:
+            logger.info("Rate limiter delayed request by %.2fs (%d tokens)", waited, tokens)
+        else:
+            logger.debug("Rate limiter accepted request immediately (%d tokens)", tokens)
+        return waited
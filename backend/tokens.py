@@ -0,0 +1,44 @@
+"""
+Token counting for prompt budgeting.
+Encodings are loaded once per model and counts are cached by a hash of the text,
+so repeated prompts (the same CSV, the same instructions) are only tokenized once.
+"""
+import functools
+import hashlib
+import logging
+import threading
+
+import tiktoken
+from cachetools import LRUCache
+
+logger = logging.getLogger(__name__)
+
+_token_counts = LRUCache(maxsize=4096)
+_token_counts_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=8)
+def get_enc(model):
+    """Get the tiktoken encoding for a model, None if it can't be loaded (e.g. offline)"""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception as e:
+        logger.warning("No tiktoken encoding for %s, estimating tokens from length: %s", model, e)
+        return None
+
+
+def count_tokens(model, text):
+    """Count the tokens in text for a model, cached by (model, content hash)"""
+    key = (model, hashlib.blake2b(text.encode(), digest_size=16).digest())
+    with _token_counts_lock:
+        count = _token_counts.get(key)
+    if count is not None:
+        return count
+
+    enc = get_enc(model)
+    # Fall back to ~4 characters per token without an encoding
+    count = len(enc.encode(text, disallowed_special=())) if enc else len(text) // 4
+
+    with _token_counts_lock:
+        _token_counts[key] = count
+    return count
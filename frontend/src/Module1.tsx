@@ -17,7 +17,10 @@ interface Module1Props {
 
 interface CsvAnalysisResult {
   summary: string;
-  dataPreview: Record<string, string | number | boolean | null>[];
+  dataPreview: {
+    columns: string[];
+    rows: (string | number | boolean | null)[][];
+  };
   metadata: {
     fileName: string;
     rows: number;
@@ -314,17 +317,15 @@ function Module1({ onBack, toast }: Module1Props) {
                 <table className="data-table">
                   <thead>
                     <tr>
-                      {Object.keys(csvAnalysisResult.dataPreview[0]).map(
-                        (key) => (
-                          <th key={key}>{key}</th>
-                        )
-                      )}
+                      {csvAnalysisResult.dataPreview.columns.map((key) => (
+                        <th key={key}>{key}</th>
+                      ))}
                     </tr>
                   </thead>
                   <tbody>
-                    {csvAnalysisResult.dataPreview.map((row, idx) => (
+                    {csvAnalysisResult.dataPreview.rows.map((row, idx) => (
                       <tr key={idx}>
-                        {Object.values(row).map((value, cellIdx) => (
+                        {row.map((value, cellIdx) => (
                           <td key={cellIdx}>{value}</td>
                         ))}
                       </tr>
@@ -81,16 +81,13 @@ function Module3({ onBack, toast }: Module3Props) {
     const startTime = Date.now();
 
     try {
-      const base64 = await fileToBase64(selectedImage);
+      const formData = new FormData();
+      formData.append("image", selectedImage);
+      formData.append("language", i18n.language);
+
       const response = await fetch("http://localhost:5001/api/analyze", {
         method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-        },
-        body: JSON.stringify({
-          image: base64,
-          language: i18n.language,
-        }),
+        body: formData,
       });
 
       const processingTime = (Date.now() - startTime) / 1000;
@@ -149,21 +146,6 @@ function Module3({ onBack, toast }: Module3Props) {
     setAnalysisResult("");
   };
 
-  const fileToBase64 = (file: File): Promise<string> => {
-    return new Promise((resolve, reject) => {
-      const reader = new FileReader();
-      reader.onload = () => {
-        if (typeof reader.result === "string") {
-          resolve(reader.result);
-        } else {
-          reject(new Error("Failed to convert file to base64."));
-        }
-      };
-      reader.onerror = reject;
-      reader.readAsDataURL(file);
-    });
-  };
-
   return (
     <div className="module2-container">
       <header className="header">
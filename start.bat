@@ -22,7 +22,7 @@ if not exist "frontend\node_modules" (
 
 REM Start backend
 echo Starting backend server on http://localhost:5001
-start "Backend Server" cmd /k "cd backend && venv\Scripts\activate.bat && python app.py"
+start "Backend Server" cmd /k "cd backend && venv\Scripts\activate.bat && set FLASK_DEBUG=1&& python app.py"
 
 REM Wait a moment for backend to start
 timeout /t 2 /nobreak >nul
@@ -40,7 +40,7 @@ fi
 echo -e "${GREEN}Starting backend server on http://localhost:5001${NC}"
 cd backend
 source venv/bin/activate
-python app.py > /dev/null 2>&1 &
+FLASK_DEBUG=1 python app.py > /dev/null 2>&1 &
 BACKEND_PID=$!
 cd ..
 